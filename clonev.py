@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 
 import math
+import collections
+import functools
 
 import argparse
 
+import numpy as np
 import yaml
 import cairo
 
@@ -11,8 +14,15 @@ import cairo
 def linspace(a, b, n=100):
 	if n < 2:
 		return b
+	return linspace_arr(a, b, n).tolist()
+
+
+# as linspace, but returns a float64 array for numeric use
+def linspace_arr(a, b, n=100):
+	if n < 2:
+		return np.array([b], dtype=np.float64)
 	diff = (float(b) - a)/(n - 1)
-	return [diff * i + a  for i in range(n)]
+	return np.arange(n) * diff + a
 
 
 def path_line(cr, src, dest):
@@ -57,7 +67,7 @@ def arrow(cr, src, dest, src_arrow=False, dest_arrow=True, arrow_length=3, arrow
 	# draw horizonal arrow
 
 	# remove angle from the dest displacement vector, since rotation has been applied
-	length = math.sqrt(dest[0]**2 + dest[1]**2)
+	length = math.hypot(dest[0], dest[1])
 	dest = (length, 0)
 	
 	dx = arrow_length * math.cos(arrow_theta)
@@ -100,6 +110,66 @@ def arrow(cr, src, dest, src_arrow=False, dest_arrow=True, arrow_length=3, arrow
 	cr.restore()
 
 
+# horizontal arrow from (x0, y) to (x1, y)
+def arrow_h(cr, x0, x1, y, src_arrow=False, dest_arrow=True, arrow_length=3, arrow_theta=math.pi/8, filled=True):
+	direction = 1 if x1 >= x0 else -1
+	_axis_arrow(cr, (x0, y), (x1, y), (direction, 0), src_arrow, dest_arrow, arrow_length, arrow_theta, filled)
+
+
+# vertical arrow from (x, y0) to (x, y1)
+def arrow_v(cr, x, y0, y1, src_arrow=False, dest_arrow=True, arrow_length=3, arrow_theta=math.pi/8, filled=True):
+	direction = 1 if y1 >= y0 else -1
+	_axis_arrow(cr, (x, y0), (x, y1), (0, direction), src_arrow, dest_arrow, arrow_length, arrow_theta, filled)
+
+
+# arrow from source to destination along the axis-aligned unit vector u
+# draws the same arrow as arrow(), but without the rotation and its trigonometry
+def _axis_arrow(cr, src, dest, u, src_arrow, dest_arrow, arrow_length, arrow_theta, filled):
+
+	ux, uy = u
+
+	# arrow head offsets along the arrow (a) and across the arrow (b)
+	a = arrow_length * math.cos(arrow_theta)
+	b = arrow_length * math.sin(arrow_theta)
+
+	src_heads = ((src[0] + a*ux + b*uy, src[1] + a*uy - b*ux), (src[0] + a*ux - b*uy, src[1] + a*uy + b*ux))
+	dest_heads = ((dest[0] - a*ux + b*uy, dest[1] - a*uy - b*ux), (dest[0] - a*ux - b*uy, dest[1] - a*uy + b*ux))
+
+	# draw main line
+	path_line(cr, src, dest)
+	cr.stroke()
+
+	if filled:
+		# draw triangle arrows
+
+		if src_arrow:
+			cr.move_to(src[0], src[1])
+			cr.line_to(*src_heads[0])
+			cr.line_to(*src_heads[1])
+			cr.close_path()
+
+		if dest_arrow:
+			cr.move_to(dest[0], dest[1])
+			cr.line_to(*dest_heads[0])
+			cr.line_to(*dest_heads[1])
+			cr.close_path()
+
+		cr.fill()
+
+	else:
+		# draw line arrows
+
+		if src_arrow:
+			path_line(cr, src, src_heads[0])
+			path_line(cr, src, src_heads[1])
+
+		if dest_arrow:
+			path_line(cr, dest, dest_heads[0])
+			path_line(cr, dest, dest_heads[1])
+
+		cr.stroke()
+
+
 ALIGN_LEFT = 0
 ALIGN_CENTER = 1
 ALIGN_RIGHT = 2
@@ -108,14 +178,53 @@ ALIGN_TOP = 0
 ALIGN_MIDDLE = 1
 ALIGN_BOTTOM = 2
 
-def text(cr, string, pos, theta = 0.0, align=ALIGN_CENTER, vertical_align=ALIGN_MIDDLE, font_face = 'san serif', font_size = 10, font_slant=cairo.FONT_SLANT_NORMAL, font_weight=cairo.FONT_WEIGHT_NORMAL):
-	cr.save()
+# text and font extents memoized by font, rendering setup and string
+_EXTENTS_CACHE_SIZE = 256
+_extents_cache = collections.OrderedDict()
+_font_extents_cache = {}
+
+# key for what, besides the font, affects extents in user space: the linear part
+# of the transformation matrix and the font options of the context and its surface
+# (e.g. hinted metrics are rounded in device space)
+def _rendering_key(cr):
+	m = cr.get_matrix()
+	options = cr.get_target().get_font_options()
+	options.merge(cr.get_font_options())
+	return (m.xx, m.yx, m.xy, m.yy,
+		options.get_antialias(), options.get_hint_style(), options.get_hint_metrics(), options.get_subpixel_order())
+
+# returns (font ascent, font descent, font height, text width)
+# font must already be selected on cr and match the given font properties
+def _text_extents(cr, string, font_face, font_size, font_slant, font_weight):
+	font = (font_face, font_size, font_slant, font_weight) + _rendering_key(cr)
+	key = font + (string,)
+	extents = _extents_cache.get(key)
+	if extents is None:
+		font_extents = _font_extents_cache.get(font)
+		if font_extents is None:
+			font_extents = _font_extents_cache[font] = cr.font_extents()[:3]
+		fascent, fdescent, fheight = font_extents
+		tw = cr.text_extents(string)[2]
+		extents = (fascent, fdescent, fheight, tw)
+		_extents_cache[key] = extents
+		if len(_extents_cache) > _EXTENTS_CACHE_SIZE:
+			_extents_cache.popitem(last=False)
+	else:
+		_extents_cache.move_to_end(key)
+	return extents
+
+
+# with no_save, only the transformation of cr is restored afterwards (the font stays selected)
+def text(cr, string, pos, theta = 0.0, align=ALIGN_CENTER, vertical_align=ALIGN_MIDDLE, font_face = 'san serif', font_size = 10, font_slant=cairo.FONT_SLANT_NORMAL, font_weight=cairo.FONT_WEIGHT_NORMAL, no_save=False):
+	if no_save:
+		matrix = cr.get_matrix()
+	else:
+		cr.save()
 
 	# setup an appropriate font and get its properties
 	cr.select_font_face(font_face , font_slant, font_weight)
 	cr.set_font_size(font_size)
-	fascent, fdescent, fheight, fxadvance, fyadvance = cr.font_extents()
-	x_off, y_off, tw, th = cr.text_extents(string)[:4]
+	fascent, fdescent, fheight, tw = _text_extents(cr, string, font_face, font_size, font_slant, font_weight)
 
 	if align == ALIGN_RIGHT:
 		nx = -tw
@@ -138,33 +247,74 @@ def text(cr, string, pos, theta = 0.0, align=ALIGN_CENTER, vertical_align=ALIGN_
 	cr.move_to(0, 0)
 	cr.show_text(string)
 
-	cr.restore()
+	if no_save:
+		cr.set_matrix(matrix)
+	else:
+		cr.restore()
+
 
+# entries are listed from index start onwards, wrapping around to the first entries
+def legend(cr, pos, labels, colours, start=0, size=5, line_spacing=2, box_spacing=2, font_size=6, font_colour=(0.0, 0.0, 0.0, 1.0)):
 
-def legend(cr, pos, labels, colours, size=5, line_spacing=2, box_spacing=2, font_size=6, font_colour=(0.0, 0.0, 0.0, 1.0)):
+	n = min(len(labels), len(colours))
 
 	cr.save()
 	
-	cr.set_font_size(font_size)
 	cr.translate(pos[0], pos[1])
 
+	# draw boxes
 	y = 0
-	for label, colour in zip(labels, colours):
-
-		# draw box
-		cr.set_source_rgba(*colour)
+	for k in range(n):
+		cr.set_source_rgba(*colours[(start + k) % n])
 		cr.rectangle(0, y, size, size)
 		cr.fill()
+		y += size + line_spacing
 
-		# add label
-		cr.set_source_rgba(*font_colour)
-		text(cr, label, (size + box_spacing, y+1), font_size=font_size, align=ALIGN_LEFT, vertical_align=ALIGN_MIDDLE)
-
+	# add labels, which all share the same font colour and font
+	# labels are left aligned and vertically centred, as text() would place them
+	cr.set_source_rgba(*font_colour)
+	cr.select_font_face('san serif', cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+	cr.set_font_size(font_size)
+	y = 0
+	for k in range(n):
+		label = labels[(start + k) % n]
+		fheight = _text_extents(cr, label, 'san serif', font_size, cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)[2]
+		cr.move_to(size + box_spacing, y + 1 + fheight/2)
+		cr.show_text(label)
 		y += size + line_spacing
 
 	cr.restore()
 
 
+# generate a function that draws the outline of a clone with n points,
+# with the curves of both halves unrolled
+@functools.lru_cache(maxsize=None)
+def _make_path_fn(n):
+
+	lines = ['def _path(cr, xs, xms, tops, bottoms):', '\tcurve_to = cr.curve_to']
+
+	# move to initial point
+	lines.append('\tcr.move_to(xs[0], tops[0])')
+
+	# draw top half
+	for i in range(1, n):
+		lines.append('\tcurve_to(xms[{0}], tops[{0}], xms[{0}], tops[{1}], xs[{1}], tops[{1}])'.format(i-1, i))
+
+	# connect path to bottom half
+	lines.append('\tcr.line_to(xs[{0}], bottoms[{0}])'.format(n-1))
+
+	# draw bottom half
+	for i in range(n-2, -1, -1):
+		lines.append('\tcurve_to(xms[{0}], bottoms[{1}], xms[{0}], bottoms[{0}], xs[{0}], bottoms[{0}])'.format(i, i+1))
+
+	# finalize path
+	lines.append('\tcr.close_path()')
+
+	namespace = {}
+	exec(compile('\n'.join(lines), '<clone path n={}>'.format(n), 'exec'), namespace)
+	return namespace['_path']
+
+
 class Clone:
 
 	def __init__(self, xs, ys, ws):
@@ -172,9 +322,46 @@ class Clone:
 		self.ys = ys
 		self.ws = ws
 
-	def stroke(self, cr, rgba, width=1):
+	# coordinates are copied on assignment and exposed as read-only views,
+	# so that only assigning new coordinates can change them (and invalidate the cached path)
+
+	@staticmethod
+	def _coordinates(values):
+		values = np.array(values, dtype=np.float64)
+		values.setflags(write=False)
+		return values
+
+	@property
+	def xs(self):
+		return self._xs.view()
+
+	@xs.setter
+	def xs(self, xs):
+		self._xs = self._coordinates(xs)
+		self._cached_path = None
+
+	@property
+	def ys(self):
+		return self._ys.view()
+
+	@ys.setter
+	def ys(self, ys):
+		self._ys = self._coordinates(ys)
+		self._cached_path = None
+
+	@property
+	def ws(self):
+		return self._ws.view()
+
+	@ws.setter
+	def ws(self, ws):
+		self._ws = self._coordinates(ws)
+		self._cached_path = None
+
+	# line_width is in user space
+	def stroke(self, cr, rgba, line_width):
 		cr.set_source_rgba(*rgba)
-		cr.set_line_width(max(cr.device_to_user_distance(width, width)))
+		cr.set_line_width(line_width)
 		self.path(cr)
 		cr.stroke()
 	
@@ -183,31 +370,33 @@ class Clone:
 		self.path(cr)
 		cr.fill()
 	
+	# append the clone outline to the current path of cr
+	# the outline is built once and replayed while the transformation matrix is unchanged
 	def path(self, cr):
 
-		xs, ys, ws = self.xs, self.ys, self.ws
+		matrix = cr.get_matrix()
+		if self._cached_path is not None and self._cached_matrix == matrix:
+			cr.append_path(self._cached_path)
+		elif cr.has_current_point():
+			# the current path holds other shapes, so the outline cannot be copied on its own
+			self._build_path(cr)
+		else:
+			self._build_path(cr)
+			self._cached_path = cr.copy_path()
+			self._cached_matrix = matrix
 
-		# move to initial point
-		x0, y0, w0 = xs[0], ys[0], ws[0]
-		cr.move_to(x0, y0 - w0)
-		
-		# draw top half
-		for x, y, w in zip(xs[1:], ys[1:], ws[1:]):
-			x_mid = (x + x0) / 2
-			cr.curve_to(x_mid, y0 - w0, x_mid, y - w, x, y - w)
-			x0, y0, w0 = x, y, w
-
-		# connect path to bottom half
-		cr.line_to(xs[-1], ys[-1] + ws[-1])
-
-		# draw bottom half
-		for x, y, w in zip(reversed(xs[:-1]), reversed(ys[:-1]), reversed(ws[:-1])):
-			x_mid = (x + x0) / 2
-			cr.curve_to(x_mid, y0 + w0, x_mid, y + w, x, y + w)
-			x0, y0, w0 = x, y, w
-
-		# finalize path
-		cr.close_path()
+	def _build_path(self, cr):
+
+		xs, ys, ws = self._xs, self._ys, self._ws
+
+		# control points of each curve lie midway between consecutive points
+		xms = (0.5 * (xs[1:] + xs[:-1])).tolist()
+		tops = (ys - ws).tolist()
+		bottoms = (ys + ws).tolist()
+		xs = xs.tolist()
+
+		# draw outline with a function specialized for the number of points
+		_make_path_fn(len(xs))(cr, xs, xms, tops, bottoms)
 	
 	def __str__(self):
 		return 'Clone: <' + ', '.join( (str(self.xs), str(self.ys), str(self.ws)) ) + '>'
@@ -216,109 +405,271 @@ class Clone:
 		return str(self)
 
 
+# fill clones in the order given
+# consecutive opaque clones of the same colour share one fill, since painting
+# their overlap once or twice gives the same result
+def fill_clones(cr, clones, colours):
+
+	if len(clones) == 1 and len(colours) > 0:
+		clones[0].fill(cr, colours[0])
+		return
+
+	# cache the outlines on an empty path first, since clones of a group are
+	# appended onto a path that already holds the previous clones
+	cr.new_path()
+	for clone in clones:
+		clone.path(cr)
+		cr.new_path()
+
+	group_colour = None
+	for clone, colour in zip(clones, colours):
+		colour = tuple(colour)
+		opaque = len(colour) < 4 or colour[3] >= 1.0
+		if colour != group_colour or not opaque:
+			if group_colour is not None:
+				cr.fill()
+			cr.set_source_rgba(*colour)
+			group_colour = colour
+		clone.path(cr)
+
+	if group_colour is not None:
+		cr.fill()
+
+
 class StreamGraph():
 
-	def __init__(self, cr, width, height, margin=(20, 60, 30, 40), background_colour=(1.0, 1.0, 1.0)):
+	# axes, grids and tick labels are not drawn when the drawing area is smaller than this
+	MIN_AXES_SIZE = 2
+
+	def __init__(self, cr, width, height, margin=(20, 60, 30, 40), background_colour=(1.0, 1.0, 1.0), render_axes=True):
 		self.cr = cr
 		self.width = width
 		self.height = height
 		self.margin = margin
 		self.background_colour = background_colour
+		self.render_axes = render_axes
+		self._layers = None
+		self._layers_key = None
+		self._layers_matrix = None
+
+	# size, horizontal center and vertical middle of the drawing area
+	def _area(self):
+		margin_top, margin_right, margin_bottom, margin_left = self.margin
+
+		area_width = self.width - margin_left - margin_right
+		area_height = self.height - margin_top - margin_bottom
+
+		area_center = margin_left + area_width/2
+		area_middle = margin_top + area_height/2
+
+		return area_width, area_height, area_center, area_middle
 
 	def draw(self, clones, colours, xs, time_labels, clone_labels, xtitle='Time', ytitle='Clonal frequency'):
 
-		cr, width, height = self.cr, self.width, self.height
+		cr = self.cr
 		margin_top, margin_right, margin_bottom, margin_left = self.margin
+		area = self._area()
+		area_width, area_height, area_center, area_middle = area
+
+		# layers below and above the clones do not depend on the clones,
+		# so they are recorded once and replayed on every draw
+		underlay, overlay = self._static_layers(cr.get_matrix(), area, xs, time_labels, xtitle, ytitle)
+
+		self._paint_layer(underlay)
+
+		# clones are invisible on an empty drawing area, which cairo also cannot scale to
+		if area_width > 0 and area_height > 0:
+
+			# set up drawing area
+			# reference point is at (left, center)
+
+			cr.save()
+
+			cr.translate(margin_left, area_middle)
+			cr.scale(area_width, area_height)
+
+			# draw clones
+			fill_clones(cr, clones, colours)
+			#lw02 = max(cr.device_to_user_distance(0.2, 0.2))
+			#for clone, colour in zip(clones, colours):
+			#	clone.stroke(cr, colour[:-1], lw02)
 
-		area_width = width - margin_left - margin_right
-		area_height = height - margin_top - margin_bottom
+			cr.restore()
+
+		self._paint_layer(overlay)
+
+		# draw fill legend, listing the first element (all clones) last
+		legend(cr, (margin_left + area_width + 10, margin_top + 5), clone_labels, colours, start=1)
+
+	# paint a recorded layer onto cr, leaving the source and transformation of cr unchanged
+	# layers are recorded in device space, so they are painted without the user transformation
+	def _paint_layer(self, layer):
+		cr = self.cr
+		cr.save()
+		cr.identity_matrix()
+		cr.set_source_surface(layer, 0, 0)
+		cr.paint()
+		cr.restore()
+
+	# return recordings of the layers below (background, y-axis grids) and
+	# above (x-axis grids, axes, labels) the clones
+	# layers are recorded under the given transformation matrix of the target, so that
+	# device line widths are kept; they are redone whenever the matrix, graph geometry or labels change
+	def _static_layers(self, matrix, area, xs, time_labels, xtitle, ytitle):
+
+		key = (self.width, self.height, tuple(self.margin), tuple(self.background_colour), self.render_axes,
+			tuple(xs), tuple(time_labels), xtitle, ytitle)
+
+		if self._layers is None or self._layers_key != key or self._layers_matrix != matrix:
+			# recordings are unbounded, since the transformed extents are not known in advance
+			underlay = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA, None)
+			overlay = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA, None)
+			ucr, ocr = cairo.Context(underlay), cairo.Context(overlay)
+			ucr.set_matrix(matrix)
+			ocr.set_matrix(matrix)
+			self._draw_static(ucr, ocr, area, xs, time_labels, xtitle, ytitle)
+			self._layers = (underlay, overlay)
+			self._layers_key = key
+			self._layers_matrix = matrix
+
+		return self._layers
+
+	# draw the layers below (on ucr) and above (on ocr) the clones
+	# area is the drawing area geometry given by _area()
+	def _draw_static(self, ucr, ocr, area, xs, time_labels, xtitle, ytitle):
+
+		width, height = self.width, self.height
+		margin_top, margin_right, margin_bottom, margin_left = self.margin
+		area_width, area_height, area_center, area_middle = area
 
 		side_left, side_top = 8, 8
 		side_right = margin_left + area_width
 		side_bottom = margin_top + area_height
 
-		area_center = margin_left + area_width/2
-		area_middle = margin_top + area_height/2
+		# skip axes on drawing areas too small for them to be visible (e.g. thumbnails)
+		render_axes = self.render_axes and min(area_width, area_height) >= self.MIN_AXES_SIZE
+
+		nyintervals = 4
 
 		# draw background
-		cr.set_source_rgb(*self.background_colour)
-		cr.rectangle(0, 0, width, height)
-		cr.fill()
+		ucr.set_source_rgb(*self.background_colour)
+		ucr.rectangle(0, 0, width, height)
+		ucr.fill()
 
+		if not render_axes:
+			return
 
-		# set up drawing area
+		# set up drawing area on both layers
 		# reference point is at (left, center)
 
-		cr.save()
+		for layer_cr in (ucr, ocr):
+			layer_cr.save()
+			layer_cr.translate(margin_left, area_middle)
+			layer_cr.scale(area_width, area_height)
 
-		cr.translate(margin_left, area_middle)
-		cr.scale(area_width, area_height)
+		# line widths in user space of the drawing area
+		lw02 = max(ucr.device_to_user_distance(0.2, 0.2))
 
 		# draw y-axis grids
-		cr.set_source_rgb(0.9, 0.9, 0.9)
-		cr.set_line_width(max(cr.device_to_user_distance(0.2, 0.2)))
-		nyintervals = 4
-		for y in linspace(-0.5, 0.5, nyintervals+1):
-			path_line(cr, (0, y), (1, y))
-			cr.stroke()
-
-
-		# draw clones
-		for clone, colour in zip(clones, colours):
-			clone.fill(cr, colour)
-			#clone.stroke(cr, colour[:-1])
+		ucr.set_source_rgb(0.9, 0.9, 0.9)
+		ucr.set_line_width(lw02)
+		for y in linspace_arr(-0.5, 0.5, nyintervals+1):
+			path_line(ucr, (0, y), (1, y))
+		ucr.stroke()
 
 		# draw x-axis grids
-		cr.set_source_rgb(0.6, 0.6, 0.6)
-		cr.set_line_width(max(cr.device_to_user_distance(0.2, 0.2)))
+		ocr.set_source_rgb(0.6, 0.6, 0.6)
+		ocr.set_line_width(lw02)
 		for x in xs:
-			path_line(cr, (x, -0.54), (x, 0.5))
-			cr.stroke()
-		
-		cr.restore()
+			path_line(ocr, (x, -0.54), (x, 0.5))
+		ocr.stroke()
+
+		for layer_cr in (ucr, ocr):
+			layer_cr.restore()
+
+		# line widths in user space of the full canvas
+		lw02 = max(ocr.device_to_user_distance(0.2, 0.2))
+		lw04 = max(ocr.device_to_user_distance(0.4, 0.4))
 
 		# set properties for axes
 
-		cr.set_source_rgb(0.0, 0.0, 0.0)
-		cr.set_line_width(max(cr.device_to_user_distance(0.4, 0.4)))
+		ocr.set_source_rgb(0.0, 0.0, 0.0)
+		ocr.set_line_width(lw04)
 
 		# add x-axis
 
-		arrow(cr, (margin_left, side_bottom + 15), (side_right, side_bottom + 15))
+		arrow_h(ocr, margin_left, side_right, side_bottom + 15)
 
-		text(cr, xtitle, (area_center, side_bottom + 20), font_size=6, font_weight=cairo.FONT_WEIGHT_BOLD)
+		text(ocr, xtitle, (area_center, side_bottom + 20), font_size=6, font_weight=cairo.FONT_WEIGHT_BOLD, no_save=True)
 
 		# add y-xis
 
-		arrow(cr, (side_left + 12, margin_top), (side_left + 12, margin_top + area_height), src_arrow=True)
+		arrow_v(ocr, side_left + 12, margin_top, margin_top + area_height, src_arrow=True)
 
-		text(cr, ytitle, (side_left, area_middle), theta=-math.pi/2, font_size=6, font_weight=cairo.FONT_WEIGHT_BOLD)
+		text(ocr, ytitle, (side_left, area_middle), theta=-math.pi/2, font_size=6, font_weight=cairo.FONT_WEIGHT_BOLD, no_save=True)
 
 		# draw y-axis reference scale
 
-		cr.set_source_rgb(0.6, 0.6, 0.6)
-		cr.set_line_width(max(cr.device_to_user_distance(0.2, 0.2)))
+		ocr.set_source_rgb(0.6, 0.6, 0.6)
+		ocr.set_line_width(lw02)
 		x = xs[1]/10 * area_width + margin_left
 		dy = float(area_height) / nyintervals
-		arrow(cr, (x, 3*dy + margin_top), (x, 4*dy + margin_top), arrow_length=dy/6, src_arrow=True)
-		text(cr, str(int(1.0/nyintervals*100)) + '%', (x + 8, 3.4*dy + margin_top), font_size=5)
+		arrow_v(ocr, x, 3*dy + margin_top, 4*dy + margin_top, arrow_length=dy/6, src_arrow=True)
+		text(ocr, str(int(1.0/nyintervals*100)) + '%', (x + 8, 3.4*dy + margin_top), font_size=5, no_save=True)
 
 		# add x-axis tick labels
 
-		cr.set_source_rgb(0.2, 0.2, 0.2)
-		cr.set_font_size(6)
+		ocr.set_source_rgb(0.2, 0.2, 0.2)
+		ocr.select_font_face('san serif', cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
+		ocr.set_font_size(6)
+		# collect glyphs of all labels and show them at once
+		scaled_font = ocr.get_scaled_font()
+		glyphs = []
 		for x, tick in zip(xs, time_labels):
-			xbearing, ybearing, twidth, theight, xadvance, yadvance = cr.text_extents(tick)
-			cr.move_to(x*area_width - twidth/2 + margin_left, margin_top*0.7)
-			cr.show_text(tick)
+			twidth = _text_extents(ocr, tick, 'san serif', 6, cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)[3]
+			glyphs.extend(scaled_font.text_to_glyphs(x*area_width - twidth/2 + margin_left, margin_top*0.7, tick, False))
+		ocr.show_glyphs(glyphs)
+		
 
-		# rearrange elements for legend
-		legend_labels = tuple(clone_labels[1:]) + (clone_labels[0],)
-		legend_colours = tuple(colours[1:]) + (colours[0],)
+# calculate y positions for clones (determine overlap between clones)
+# y positions using bottom as reference point
+# clone_freqs is a (nclones, ntimes-1) array; returns an array of the same shape
+# all time points and clones are computed at once
+def _compute_clone_ys(clone_freqs, tumour_freq):
+
+	purity = tumour_freq
+
+	# if freq_sum > purity, then there must be some overlap
+	freq_sum = np.add.reduce(clone_freqs, axis=0)
+	# total spacing 'deficit'
+	spacing = np.minimum(purity - freq_sum, 0.0)
+
+	# shift to make clones centered vertically
+	# i.e. (1 - purity) * 0.5 if freq_sum >= purity, else (1 - freq_sum) * 0.5
+	shift = (1.0 - np.minimum(freq_sum, purity)) * 0.5
+
+	# distribute spacing 'deficit' by normalized frequency, skipping first element,
+	# since first element will not be moved
+	heights = clone_freqs.copy()
+	if len(clone_freqs) > 1:
+		freq_sum2 = np.add.reduce(clone_freqs[1:], axis=0)
+		if not freq_sum2.all():
+			raise ZeroDivisionError('float division by zero')
+		heights[1:] += spacing * (clone_freqs[1:] / freq_sum2)
+
+	# calculate clone y positions
+	half_freqs = clone_freqs / 2
+	cumy = np.cumsum(heights, axis=0)
+	# convert y coordinate origin from 0 to -0.5
+	# convert y coordinate of reference point from (bottom) to (middle)
+	ys = cumy + shift - 0.5 - half_freqs
+	# for unknown reason, y can be too small for some clone (when there is a spacing deficit)
+	# use a lower bound as a hack
+	# FIXME find the reason and fix this properly!
+	ys[ys - half_freqs < -0.5] = 0.0
+
+	return ys
 
-		# draw fill legend
-		legend(cr, (margin_left + area_width + 10, margin_top + 5), legend_labels, legend_colours)
-		
 
 # create clones based on observed clonal frequencies
 # order of clones are not changed
@@ -326,57 +677,17 @@ class StreamGraph():
 # (overlap is almost surely not distributed as such, but no overlap data is available)
 def create_clones(freqs):
 
+	# rows are clones, columns are time points
+	freqs = np.asarray(freqs, dtype=np.float64)
+
 	# first entry is contain clonal frequency combining all clones (i.e. tumour fraction)
 	tumour_freq = freqs[0]
 	clone_freqs = freqs[1:]
 
-	ntimes = len(clone_freqs[0]) + 1
+	ntimes = clone_freqs.shape[1] + 1
 
 	# calculate y positions for clones (determine overlap between clones)
-	# y positions using bottom as reference point
-
-	clone_ys = []
-	for i in range(ntimes-1):
-
-		# copy clone frequencies into new list to facilitate downstream computation
-		fs = []
-		for clone_freq in clone_freqs:
-			fs.append(clone_freq[i])
-
-		purity = tumour_freq[i]
-		# if freq_sum > purity, then there must be some overlap
-		freq_sum = sum(fs)
-		# total spacing 'deficit'
-		spacing = min(purity - freq_sum, 0)
-
-		# shift to make clones centered vertically
-		if freq_sum >= purity:
-			shift = (1.0 - purity) * 0.5
-		else:
-			#shift = (purity - freq_sum) * 0.5
-			shift = (1.0 - freq_sum) * 0.5
-
-		# calculate normalized frequency, skipping first element, since first element will not be moved
-		# for distributing spacing 'deficit'
-		freq_sum2 = sum(fs[1:])
-		gs = [0] + [f/freq_sum2 for f in fs[1:]]
-
-		# calculate clone y positions
-		ys = []
-		cumy = 0
-		for f, g in zip(fs, gs):
-			cumy += f + (spacing * g)
-			# convert y coordinate origin from 0 to -0.5
-			# convert y coordinate of reference point from (bottom) to (middle)
-			y = cumy + shift - 0.5 - f/2
-			# for unknown reason, y can be too small for some clone (when there is a spacing deficit)
-			# use a lower bound as a hack
-			# FIXME find the reason and fix this properly!
-			if y - f/2 < -0.5:
-				y = 0
-			ys.append(y)
-
-		clone_ys.append(ys)
+	clone_ys = _compute_clone_ys(clone_freqs, tumour_freq)
 
 	#print(clone_ys)
 
@@ -388,42 +699,22 @@ def create_clones(freqs):
 	# assume all detectable clones has arisen before t = 0.5
 	# time in [0, 0.5], time = (1 - p) * 0.5
 
-	clone_all = Clone(linspace(0, 1, ntimes), [0] * ntimes, [0] + [f*0.5 for f in tumour_freq])
+	clone_all = Clone(linspace_arr(0, 1, ntimes), [0.0] * ntimes, [0.0] + (tumour_freq * 0.5).tolist())
+
+	# observation times, normalized by number of time intervals
+	ts = (np.arange(1, ntimes) / float(ntimes-1)).tolist()
+
+	# assume that clone was present at first observation even if it was not detectable
+	# (unlikely for clones to arise during the selection) between observations
+
+	# clone is emerging: add point between time 0 and first observation
+	# y location of clone: set to 0 to ensure new clones are not de novo (can be relaxed)
+	# size of clone: 0
+	t0s = ((1 - clone_freqs[:, 0])*0.5 / float(ntimes-1)).tolist()
 
 	clones = [clone_all]
-	clone_idx = 0
-	for clone_freq in clone_freqs:
-
-		xs, ys, ws = [], [], []
-		t = 0
-		for f in clone_freq:
-
-			# assume that clone was present at first observation even if it was not detectable
-			# (unlikely for clones to arise during the selection) between observations
-
-			if len(xs) == 0:
-				# clone is emerging
-				# add point between time t and t+1
-				# time since previous observation + time of previous observation
-				xs.append((1 - f)*0.5 + t)
-				# y location of clone: set to 0 to ensure new clones are not de novo (can be relaxed)
-				ys.append(0)
-				# size of clone
-				ws.append(0)
-
-			# add point at t+1
-			xs.append(t+1)
-			ys.append(clone_ys[t][clone_idx])
-			ws.append(f/2)
-
-			t += 1
-
-		# normalize times by number of time intervals
-		xs = [x/float(ntimes-1) for x in xs]
-		# create clone
-		clones.append(Clone(xs, ys, ws))
-
-		clone_idx += 1
+	for t0, ys, ws in zip(t0s, clone_ys.tolist(), (clone_freqs / 2).tolist()):
+		clones.append(Clone([t0] + ts, [0.0] + ys, [0.0] + ws))
 
 	return clones
 